@@ -1,46 +1,209 @@
 """Module for decoding secret messages from ASCII art grids in Google Docs."""
 
-from dataclasses import dataclass
-from typing import Dict, Generator, Tuple
+import asyncio
+import sys
+from typing import Dict, Generator, List, Optional, Tuple
 
-from bs4 import BeautifulSoup
-import requests
+import httpx
+from lxml import etree
+import numpy as np
 from requests.exceptions import RequestException
+import requests_cache
 
+# Session used to fetch documents, created by get_session() on first use
+session: Optional[requests_cache.CachedSession] = None
 
-@dataclass
-class Coordinate:
-    """Represents a single coordinate in the ASCII art grid."""
+# Size of the blocks fed to the HTML parser, so that each table row can be
+# discarded soon after it is parsed rather than once the whole tree is built
+CHUNK_SIZE = 65536
 
-    x: int
-    y: int
-    char: str
+# Largest coordinate that fits in the grid's int32 coordinate arrays
+MAX_COORDINATE = np.iinfo(np.int32).max
+
+
+def get_session() -> requests_cache.CachedSession:
+    """Get the session used to fetch documents, creating it on first use.
+
+    Published documents rarely change, so fetched pages are kept between runs in
+    the user's cache directory. Expired entries are revalidated using the
+    ETag/Last-Modified headers.
+    """
+    global session
+    if session is None:
+        session = requests_cache.CachedSession(
+            "decoder_cache", use_cache_dir=True, expire_after=3600
+        )
+    return session
 
 
 class Grid:
     """Represents the ASCII art grid with its dimensions and characters."""
 
-    def __init__(self, coordinates: Dict[Tuple[int, int], str], max_x: int, max_y: int):
-        """Initialize the grid with coordinates and dimensions."""
-        self.coordinates = coordinates
+    def __init__(
+        self, xs: np.ndarray, ys: np.ndarray, chars: str, max_x: int, max_y: int
+    ):
+        """Initialize the grid with coordinates and dimensions.
+
+        The characters are stored sparsely, as parallel arrays of coordinates and a
+        string holding one character per coordinate: chars[i] is at (xs[i], ys[i]).
+        """
+        self.xs = xs
+        self.ys = ys
+        self.chars = chars
         self.max_x = max_x
         self.max_y = max_y
+        self.__lookup: Optional[Dict[int, str]] = None
 
     def get_char(self, x: int, y: int) -> str:
         """Get the character at the specified coordinates, or space if none exists."""
-        return self.coordinates.get((x, y), " ")
-
-    def __char_generator(self) -> Generator[str, None, None]:
-        """Generator that yields characters row by row, top to bottom."""
-        for y in range(self.max_y, -1, -1):
-            for x in range(self.max_x + 1):
-                yield self.get_char(x, y)
-            if y > 0:  # Don't add newline after last row
-                yield "\n"
+        if not (0 <= x <= self.max_x and 0 <= y <= self.max_y):
+            return " "
+        stride = self.max_x + 1
+        if self.__lookup is None:
+            # Rarely needed, so only index the characters on first use. Keying by
+            # the flattened position avoids building and hashing a tuple per cell.
+            keys = self.ys.astype(np.int64) * stride + self.xs
+            self.__lookup = dict(zip(keys.tolist(), self.chars))
+        return self.__lookup.get(y * stride + x, " ")
 
     def to_string(self) -> str:
-        """Convert the grid to a string representation."""
-        return "".join(self.__char_generator())
+        """Convert the grid to a string representation, top row first."""
+        # Each row ends with a newline, and the rows are stored top row first
+        buffer = np.full((self.max_y + 1, self.max_x + 2), " ", dtype="<U1")
+        buffer[:, -1] = "\n"
+        buffer[self.max_y - self.ys, self.xs] = np.frombuffer(
+            self.chars.encode("utf-32-le"), dtype="<U1"
+        )
+
+        # "<U1" arrays are UTF-32 code units; drop the newline after the last row
+        return buffer.tobytes().decode("utf-32-le")[:-1]
+
+
+def _read_events(
+    parser: etree.HTMLPullParser, content: bytes
+) -> Generator[Tuple[str, etree._Element], None, None]:
+    """Feed the document to the parser in chunks, yielding events as they are ready."""
+    for start in range(0, len(content), CHUNK_SIZE):
+        parser.feed(content[start : start + CHUNK_SIZE])
+        yield from parser.read_events()
+    try:
+        parser.close()
+    except etree.XMLSyntaxError:
+        return  # Nothing was parsed, e.g. an empty document
+    yield from parser.read_events()
+
+
+def _iter_table_rows(
+    content: bytes, encoding: Optional[str]
+) -> Generator[List[str], None, None]:
+    """Incrementally parse HTML, yielding the cell texts of each row of its first table.
+
+    Each row is discarded from the tree once it has been yielded, so the parsed
+    tree never holds the whole table, although the document itself is in memory.
+
+    Args:
+        content (bytes): The raw HTML document
+        encoding (Optional[str]): Encoding of the document, or None to detect it
+
+    Yields:
+        List[str]: The text of each cell in the row
+
+    Raises:
+        ValueError: If no table is found in the document
+    """
+    # Only report the end of the elements of interest, skipping the <p>/<span>
+    # wrappers in cells. Start events are not needed, as every element is handled
+    # once it is complete, and requesting them would double the events dispatched.
+    parser = etree.HTMLPullParser(
+        events=("end",), tag=("table", "tr", "td"), encoding=encoding
+    )
+    cols: List[str] = []
+    append_col = cols.append
+    tostring = etree.tostring
+
+    # Cells are collected as their end tags are parsed, in the same pass that
+    # finds the rows, rather than walking each row's children again afterwards
+    for _, elem in _read_events(parser, content):
+        tag = elem.tag
+        if tag == "td":
+            # Serialising the cell as text is done in C, unlike joining itertext()
+            append_col(tostring(elem, method="text", encoding=str, with_tail=False))
+        elif tag == "tr":
+            # Rows outside a table, which libxml2 keeps where they are, are skipped
+            if next(elem.iterancestors("table"), None) is not None:
+                yield cols
+            cols = []
+            append_col = cols.append
+
+            # Free the row, along with the (already cleared) rows before it
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        elif next(elem.iterancestors("table"), None) is None:
+            return  # Only the first table, including any nested in it, is used
+
+    raise ValueError("No table found in the document")
+
+
+def parse_grid(content: bytes, encoding: Optional[str]) -> Grid:
+    """Parse coordinates and characters from the HTML of a Google Doc.
+
+    Args:
+        content (bytes): The raw HTML document
+        encoding (Optional[str]): Encoding of the document, or None to detect it
+
+    Returns:
+        Grid: A Grid object containing the parsed coordinates and dimensions
+
+    Raises:
+        ValueError: If no table is found in the document or if columns are missing
+    """
+    # Collect the coordinates as parallel lists rather than one object per cell
+    xs: List[int] = []
+    ys: List[int] = []
+    chars: List[str] = []
+
+    # Bind the names used for every row to locals, which are cheaper to look up
+    _int = int
+    _len = len
+    _intern = sys.intern
+    append_x = xs.append
+    append_y = ys.append
+    append_char = chars.append
+
+    rows = _iter_table_rows(content, encoding)
+
+    # Skip the header row
+    next(rows, None)
+    for cols in rows:
+        if _len(cols) != 3:
+            raise ValueError("Missing columns in the table")
+
+        try:
+            # int() already ignores surrounding whitespace
+            x = _int(cols[0])
+            # Grids only use a handful of distinct characters, so share one string
+            # object per character rather than allocating a new one per row
+            char = _intern(cols[1].strip()[:1] or " ")
+            y = _int(cols[2])
+            if x < 0 or y < 0:
+                raise ValueError("coordinates must not be negative")
+            if x > MAX_COORDINATE or y > MAX_COORDINATE:
+                raise ValueError(f"coordinates must not exceed {MAX_COORDINATE}")
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"Invalid coordinate data in row: {e}") from e
+
+        append_x(x)
+        append_y(y)
+        append_char(char)
+
+    # Find the dimensions in a single vectorised pass rather than once per row
+    x_array = np.array(xs, dtype=np.int32)
+    y_array = np.array(ys, dtype=np.int32)
+    max_x = int(x_array.max(initial=0))
+    max_y = int(y_array.max(initial=0))
+
+    return Grid(x_array, y_array, "".join(chars), max_x, max_y)
 
 
 def parse_coordinates(doc_url: str) -> Grid:
@@ -58,41 +221,47 @@ def parse_coordinates(doc_url: str) -> Grid:
     """
     try:
         # Fetch the document content
-        response = requests.get(doc_url)
+        response = get_session().get(doc_url)
         response.raise_for_status()  # Raise exception for bad status codes
     except RequestException as e:
         raise RequestException(f"Failed to fetch document: {e}") from e
 
-    soup = BeautifulSoup(response.text, "html.parser")
+    return parse_grid(response.content, response.encoding)
 
-    # Find the table in the document
-    table = soup.find("table")
-    if not table:
-        raise ValueError("No table found in the document")
 
-    coordinates: Dict[Tuple[int, int], str] = {}
-    max_x = 0
-    max_y = 0
+async def parse_many(doc_urls: List[str]) -> List[Grid]:
+    """Parse coordinates and characters from several Google Doc URLs concurrently.
 
-    # Skip the header row
-    rows = table.find_all("tr")[1:]
-    for row in rows:
-        cols = row.find_all("td")
-        if len(cols) != 3:
-            raise ValueError("Missing columns in the table")
+    The documents are fetched concurrently over a shared HTTP/2 connection pool and
+    then parsed in worker threads, where lxml's C parser runs without the GIL.
+    Unlike parse_coordinates, these fetches do not use the document cache.
 
-        try:
-            x = int(cols[0].text.strip())
-            char = cols[1].text.strip()
-            y = int(cols[2].text.strip())
-        except (ValueError, IndexError) as e:
-            raise ValueError(f"Invalid coordinate data in row: {e}") from e
+    Args:
+        doc_urls (List[str]): URLs of the Google Docs containing the character
+            coordinates
+
+    Returns:
+        List[Grid]: A Grid object for each document, in the order of the URLs
 
-        coordinates[(x, y)] = char
-        max_x = max(max_x, x)
-        max_y = max(max_y, y)
+    Raises:
+        ValueError: If no table is found in a document or if columns are missing
+        RequestException: If there's an error fetching a document
+    """
+    try:
+        async with httpx.AsyncClient(http2=True, follow_redirects=True) as client:
+            responses = await asyncio.gather(*(client.get(url) for url in doc_urls))
+        for response in responses:
+            response.raise_for_status()  # Raise exception for bad status codes
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
+        # InvalidURL, raised for malformed URLs, is not an HTTPError
+        raise RequestException(f"Failed to fetch document: {e}") from e
 
-    return Grid(coordinates, max_x, max_y)
+    return await asyncio.gather(
+        *(
+            asyncio.to_thread(parse_grid, response.content, response.encoding)
+            for response in responses
+        )
+    )
 
 
 def decode_secret_message(doc_url: str) -> None:
@@ -108,6 +277,20 @@ def decode_secret_message(doc_url: str) -> None:
     print(grid.to_string())
 
 
+async def decode_many(doc_urls: List[str]) -> None:
+    """Decodes secret messages from several Google Docs, fetching them concurrently.
+
+    Args:
+        doc_urls (List[str]): URLs of the Google Docs containing the character
+            coordinates
+
+    Returns:
+        None: Prints each decoded message to stdout, in the order of the URLs
+    """
+    for grid in await parse_many(doc_urls):
+        print(grid.to_string())
+
+
 if __name__ == "__main__":
     # Example usage
     example_url = "https//some:url"  # noqa: E501
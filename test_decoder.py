@@ -1,8 +1,16 @@
 """Tests for the secret message decoder module."""
 
-from decoder import decode_secret_message, parse_coordinates
+import asyncio
+import io
+
+import decoder
+from decoder import decode_many, decode_secret_message, parse_coordinates
+import httpx
 import pytest
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
+import requests_cache
+from urllib3 import HTTPResponse
 
 
 class MockResponse:
@@ -12,6 +20,8 @@ class MockResponse:
         """Initialize a mock response with text and status code."""
         self.text = text
         self.status_code = status_code
+        self.encoding = "utf-8"
+        self.content = text.encode(self.encoding)
 
     def raise_for_status(self):
         """Raise RequestException if status code indicates an error."""
@@ -19,6 +29,40 @@ class MockResponse:
             raise RequestException(f"HTTP {self.status_code}")
 
 
+class MockSession:
+    """Mock session object returning a fixed response for every request."""
+
+    def __init__(self, text):
+        """Initialize a mock session with the text of the document it serves."""
+        self.text = text
+
+    def get(self, url, **kwargs):
+        """Return a mock response holding the document."""
+        return MockResponse(self.text)
+
+
+class MockAdapter(HTTPAdapter):
+    """Mock transport adapter serving a fixed document and counting requests."""
+
+    def __init__(self, text):
+        """Initialize a mock adapter with the text of the document it serves."""
+        super().__init__()
+        self.text = text
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        """Build a response holding the document, without any network access."""
+        self.calls += 1
+        raw = HTTPResponse(
+            body=io.BytesIO(self.text.encode("utf-8")),
+            headers={"Content-Type": "text/html; charset=utf-8"},
+            status=200,
+            preload_content=False,
+            request_url=request.url,
+        )
+        return self.build_response(request, raw)
+
+
 def test_parse_coordinates_valid():
     """Test parsing coordinates from a valid document."""
     # Mock HTML content that represents the letter 'F'
@@ -36,27 +80,21 @@ def test_parse_coordinates_valid():
     </table>
     """
 
-    # Mock the requests.get function
-    import requests
-
-    original_get = requests.get
-    requests.get = lambda url: MockResponse(mock_html)
+    # Mock the session used to fetch documents
+    original_session = decoder.session
+    decoder.session = MockSession(mock_html)
 
     try:
         # Call the function
         grid = parse_coordinates("https://example.com")
 
         # Verify the coordinates
-        assert grid.coordinates == {
-            (0, 0): "█",
-            (0, 1): "█",
-            (0, 2): "█",
-            (1, 1): "▀",
-            (1, 2): "▀",
-            (2, 1): "▀",
-            (2, 2): "▀",
-            (3, 2): "▀",
-        }
+        assert grid.xs.tolist() == [0, 0, 0, 1, 1, 2, 2, 3]
+        assert grid.ys.tolist() == [0, 1, 2, 1, 2, 1, 2, 2]
+        assert grid.chars == "███▀▀▀▀▀"
+        assert grid.get_char(3, 2) == "▀"
+        assert grid.get_char(3, 0) == " "
+        assert grid.get_char(4, 0) == " "
 
         # Verify max coordinates
         assert grid.max_x == 3
@@ -65,8 +103,8 @@ def test_parse_coordinates_valid():
         # Verify string representation
         assert grid.to_string() == "█▀▀▀\n█▀▀ \n█   "
     finally:
-        # Restore the original requests.get
-        requests.get = original_get
+        # Restore the original session
+        decoder.session = original_session
 
 
 def test_parse_coordinates_no_table():
@@ -74,19 +112,111 @@ def test_parse_coordinates_no_table():
     # Mock empty HTML content
     mock_html = "<html><body></body></html>"
 
-    # Mock the requests.get function
-    import requests
-
-    original_get = requests.get
-    requests.get = lambda url: MockResponse(mock_html)
+    # Mock the session used to fetch documents
+    original_session = decoder.session
+    decoder.session = MockSession(mock_html)
 
     try:
         # Verify that the function raises ValueError for empty document
         with pytest.raises(ValueError, match="No table found in the document"):
             parse_coordinates("https://example.com")
     finally:
-        # Restore the original requests.get
-        requests.get = original_get
+        # Restore the original session
+        decoder.session = original_session
+
+
+def test_parse_coordinates_small_chunks():
+    """Test parsing coordinates when the document is fed to the parser bytewise."""
+    # Mock HTML content with the cell text wrapped and padded like in a Google Doc,
+    # followed by a second table that should be ignored
+    mock_html = """
+    <table>
+        <tr><td><p><span>x-coordinate</span></p></td><td>Character</td>
+            <td>y-coordinate</td></tr>
+        <tr><td><p><span>0</span></p></td><td><p><span>█</span></p></td>
+            <td><p><span>1</span></p></td></tr>
+        <tr><td> <p><span>1</span></p> </td><td> <p><span>▀</span></p> </td>
+            <td>
+                <p><span>0</span></p>
+            </td></tr>
+    </table>
+    <table>
+        <tr><td>x-coordinate</td><td>Character</td><td>y-coordinate</td></tr>
+        <tr><td>5</td><td>█</td><td>5</td></tr>
+    </table>
+    """
+
+    # Mock the session used to fetch documents and feed the parser one byte at a
+    # time, splitting the multi-byte characters across chunks
+    original_session = decoder.session
+    original_chunk_size = decoder.CHUNK_SIZE
+    decoder.session = MockSession(mock_html)
+    decoder.CHUNK_SIZE = 1
+
+    try:
+        grid = parse_coordinates("https://example.com")
+
+        assert grid.xs.tolist() == [0, 1]
+        assert grid.ys.tolist() == [1, 0]
+        assert grid.chars == "█▀"
+        assert grid.to_string() == "█ \n ▀"
+    finally:
+        # Restore the original session and chunk size
+        decoder.session = original_session
+        decoder.CHUNK_SIZE = original_chunk_size
+
+
+def test_parse_coordinates_stray_row():
+    """Test that a row outside any table is not taken as the header row."""
+    # Mock HTML content with a row before the table, which the parser keeps
+    # outside of it
+    mock_html = """
+    <tr><td>stray</td></tr>
+    <table>
+        <tr><td>x-coordinate</td><td>Character</td><td>y-coordinate</td></tr>
+        <tr><td>0</td><td>A</td><td>0</td></tr>
+    </table>
+    """
+
+    # Mock the session used to fetch documents
+    original_session = decoder.session
+    decoder.session = MockSession(mock_html)
+
+    try:
+        grid = parse_coordinates("https://example.com")
+
+        assert grid.to_string() == "A"
+    finally:
+        # Restore the original session
+        decoder.session = original_session
+
+
+def test_parse_coordinates_cached():
+    """Test that fetching the same document again is answered from the cache."""
+    # Mock HTML content that represents a single character
+    mock_html = """
+    <table>
+        <tr><td>x-coordinate</td><td>Character</td><td>y-coordinate</td></tr>
+        <tr><td>0</td><td>█</td><td>0</td></tr>
+    </table>
+    """
+
+    # Use an in-memory cache in front of a mock transport
+    adapter = MockAdapter(mock_html)
+    original_session = decoder.session
+    decoder.session = requests_cache.CachedSession(backend="memory")
+    decoder.session.mount("https://", adapter)
+
+    try:
+        first = parse_coordinates("https://example.com/doc")
+        second = parse_coordinates("https://example.com/doc")
+
+        # Verify that only the first call reached the network
+        assert adapter.calls == 1
+        assert first.to_string() == second.to_string() == "█"
+    finally:
+        # Restore the original session
+        decoder.session = original_session
 
 
 def test_parse_coordinates_invalid_data():
@@ -99,19 +229,63 @@ def test_parse_coordinates_invalid_data():
     </table>
     """
 
-    # Mock the requests.get function
-    import requests
-
-    original_get = requests.get
-    requests.get = lambda url: MockResponse(mock_html)
+    # Mock the session used to fetch documents
+    original_session = decoder.session
+    decoder.session = MockSession(mock_html)
 
     try:
         # Verify that the function raises ValueError for invalid data
         with pytest.raises(ValueError, match="Invalid coordinate data"):
             parse_coordinates("https://example.com")
     finally:
-        # Restore the original requests.get
-        requests.get = original_get
+        # Restore the original session
+        decoder.session = original_session
+
+
+def test_parse_coordinates_negative():
+    """Test parsing coordinates with a negative coordinate."""
+    # Mock HTML content with a coordinate outside the grid
+    mock_html = """
+    <table>
+        <tr><td>x-coordinate</td><td>Character</td><td>y-coordinate</td></tr>
+        <tr><td>0</td><td>█</td><td>-1</td></tr>
+    </table>
+    """
+
+    # Mock the session used to fetch documents
+    original_session = decoder.session
+    decoder.session = MockSession(mock_html)
+
+    try:
+        # Verify that the function raises ValueError for the negative coordinate
+        with pytest.raises(ValueError, match="Invalid coordinate data"):
+            parse_coordinates("https://example.com")
+    finally:
+        # Restore the original session
+        decoder.session = original_session
+
+
+def test_parse_coordinates_too_large():
+    """Test parsing coordinates with a coordinate too large for the grid."""
+    # Mock HTML content with a coordinate beyond the int32 range
+    mock_html = """
+    <table>
+        <tr><td>x-coordinate</td><td>Character</td><td>y-coordinate</td></tr>
+        <tr><td>3000000000</td><td>█</td><td>0</td></tr>
+    </table>
+    """
+
+    # Mock the session used to fetch documents
+    original_session = decoder.session
+    decoder.session = MockSession(mock_html)
+
+    try:
+        # Verify that the function raises ValueError for the large coordinate
+        with pytest.raises(ValueError, match="Invalid coordinate data"):
+            parse_coordinates("https://example.com")
+    finally:
+        # Restore the original session
+        decoder.session = original_session
 
 
 def test_parse_coordinates_missing_columns():
@@ -131,19 +305,17 @@ def test_parse_coordinates_missing_columns():
     </table>
     """
 
-    # Mock the requests.get function
-    import requests
-
-    original_get = requests.get
-    requests.get = lambda url: MockResponse(mock_html)
+    # Mock the session used to fetch documents
+    original_session = decoder.session
+    decoder.session = MockSession(mock_html)
 
     try:
         # Verify that the function raises ValueError for missing columns
         with pytest.raises(ValueError, match="Missing columns in the table"):
             parse_coordinates("https://example.com")
     finally:
-        # Restore the original requests.get
-        requests.get = original_get
+        # Restore the original session
+        decoder.session = original_session
 
 
 def test_decode_secret_message(capsys, snapshot):
@@ -166,11 +338,9 @@ def test_decode_secret_message(capsys, snapshot):
     </table>
     """
 
-    # Mock the requests.get function
-    import requests
-
-    original_get = requests.get
-    requests.get = lambda url: MockResponse(mock_html)
+    # Mock the session used to fetch documents
+    original_session = decoder.session
+    decoder.session = MockSession(mock_html)
 
     try:
         # Call the function
@@ -183,8 +353,8 @@ def test_decode_secret_message(capsys, snapshot):
         # Verify against snapshot
         assert output == snapshot
     finally:
-        # Restore the original requests.get
-        requests.get = original_get
+        # Restore the original session
+        decoder.session = original_session
 
 
 def test_empty_document():
@@ -194,16 +364,72 @@ def test_empty_document():
     # Mock empty HTML content
     mock_html = "<html><body></body></html>"
 
-    # Mock the requests.get function
-    import requests
-
-    original_get = requests.get
-    requests.get = lambda url: MockResponse(mock_html)
+    # Mock the session used to fetch documents
+    original_session = decoder.session
+    decoder.session = MockSession(mock_html)
 
     try:
         # Verify that the function raises ValueError for empty document
         with pytest.raises(ValueError, match="No table found in the document"):
             decode_secret_message(test_url)
     finally:
-        # Restore the original requests.get
-        requests.get = original_get
+        # Restore the original session
+        decoder.session = original_session
+
+
+def test_decode_many(capsys):
+    """Test decoding and printing several secret messages concurrently."""
+    # Mock HTML content for two documents, each holding a single character
+    mock_htmls = {
+        "/first": """
+        <table>
+            <tr><td>x-coordinate</td><td>Character</td><td>y-coordinate</td></tr>
+            <tr><td>1</td><td>█</td><td>0</td></tr>
+        </table>
+        """,
+        "/second": """
+        <table>
+            <tr><td>x-coordinate</td><td>Character</td><td>y-coordinate</td></tr>
+            <tr><td>0</td><td>▀</td><td>1</td></tr>
+        </table>
+        """,
+    }
+
+    # Mock the HTTP client's transport
+    original_client = httpx.AsyncClient
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, text=mock_htmls[request.url.path])
+    )
+    httpx.AsyncClient = lambda **kwargs: original_client(transport=transport, **kwargs)
+
+    try:
+        asyncio.run(
+            decode_many(["https://example.com/first", "https://example.com/second"])
+        )
+
+        # Verify the messages are printed in the order of the URLs
+        captured = capsys.readouterr()
+        assert captured.out == " █\n▀\n \n"
+    finally:
+        # Restore the original HTTP client
+        httpx.AsyncClient = original_client
+
+
+def test_decode_many_http_error():
+    """Test decoding several secret messages when a document can't be fetched."""
+    # Mock the HTTP client's transport
+    original_client = httpx.AsyncClient
+    transport = httpx.MockTransport(lambda request: httpx.Response(404))
+    httpx.AsyncClient = lambda **kwargs: original_client(transport=transport, **kwargs)
+
+    try:
+        # Verify that the function raises RequestException for the missing document
+        with pytest.raises(RequestException, match="Failed to fetch document"):
+            asyncio.run(decode_many(["https://example.com/missing"]))
+
+        # Verify that a malformed URL is reported the same way
+        with pytest.raises(RequestException, match="Failed to fetch document"):
+            asyncio.run(decode_many(["http://[::1"]))
+    finally:
+        # Restore the original HTTP client
+        httpx.AsyncClient = original_client